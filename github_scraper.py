@@ -1,7 +1,7 @@
 import os
+import time
+import requests
 from dotenv import load_dotenv
-from github import Github
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 
@@ -11,6 +11,36 @@ GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 
 OUTPUT_DIR = Path("data")
 GITHUB_FILE = OUTPUT_DIR / "github_data.txt"
+GRAPHQL_URL = "https://api.github.com/graphql"
+RATE_LIMIT_THRESHOLD = 50    # sleep until reset once fewer points than this remain
+MAX_RATE_LIMIT_RETRIES = 3
+
+# README file names tried at the repo root, in order (get_readme() was case-insensitive)
+README_NAMES = [
+    "README.md", "readme.md", "Readme.md", "README.markdown",
+    "README.rst", "readme.rst", "README.txt", "README",
+]
+README_FIELDS = "\n".join(
+    f'        readme{i}: object(expression: "HEAD:{name}") {{ ... on Blob {{ text }} }}'
+    for i, name in enumerate(README_NAMES)
+)
+
+# One request returns up to 100 repos together with their README text
+AFFILIATIONS = "[OWNER, COLLABORATOR, ORGANIZATION_MEMBER]"
+REPOS_QUERY = f"""
+query($cursor: String) {{
+  viewer {{
+    repositories(first: 100, after: $cursor, affiliations: {AFFILIATIONS}, ownerAffiliations: {AFFILIATIONS}) {{
+      pageInfo {{ hasNextPage endCursor }}
+      nodes {{
+        name
+        url
+{README_FIELDS}
+      }}
+    }}
+  }}
+}}
+"""
 
 if not GITHUB_TOKEN:
     raise ValueError("❌ Missing GITHUB_TOKEN in .env")
@@ -18,43 +48,111 @@ if not GITHUB_TOKEN:
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
+# ================= RATE LIMITING =================
+class RateLimitError(Exception):
+    def __init__(self, reset_at):
+        super().__init__(f"GitHub rate limit hit, resets at {time.ctime(reset_at)}")
+        self.reset_at = reset_at
+
+
+def wait_for_reset(reset_at):
+    sleep = reset_at - time.time()
+    if sleep > 0:
+        print(f"⏳ GitHub rate limit low, sleeping {sleep:.0f}s until reset...")
+        time.sleep(sleep + 1)
+
+
+def post_query(headers, cursor):
+    resp = requests.post(
+        GRAPHQL_URL,
+        json={"query": REPOS_QUERY, "variables": {"cursor": cursor}},
+        headers=headers,
+        timeout=30,
+    )
+    remaining = int(resp.headers.get("X-RateLimit-Remaining", RATE_LIMIT_THRESHOLD))
+    reset_at = int(resp.headers.get("X-RateLimit-Reset", time.time()))
+    if "Retry-After" in resp.headers:  # secondary rate limit
+        reset_at = time.time() + int(resp.headers["Retry-After"])
+
+    if resp.status_code in (403, 429) and (remaining == 0 or "Retry-After" in resp.headers):
+        raise RateLimitError(reset_at)
+    resp.raise_for_status()
+
+    payload = resp.json()
+    errors = payload.get("errors") or []
+    if any(e.get("type") == "RATE_LIMITED" for e in errors):
+        raise RateLimitError(reset_at)
+    if not (payload.get("data") or {}).get("viewer"):
+        raise RuntimeError(f"❌ GitHub GraphQL error: {errors}")
+    # Partial results (e.g. FORBIDDEN for SAML orgs the token isn't authorized for)
+    # come back as null nodes next to the errors; keep the repos we did get
+    for e in errors:
+        print(f"⚠️ GitHub GraphQL error, skipping affected repo: {e.get('message', e)}")
+    return payload, remaining, reset_at
+
+
 # ================= STEP 1: Fetch GitHub Repositories =================
-def fetch_repos():
-    g = Github(GITHUB_TOKEN)
-    user = g.get_user()
-    repo_results = []
-
-    def process_repo(repo):
-        try:
-            info = [
-                f"===== REPO: {repo.name} =====\n",
-                f"URL: {repo.html_url}\n"
-            ]
-            try:
-                readme = repo.get_readme()
-                info.append("\n--- README ---\n")
-                info.append(readme.decoded_content.decode("utf-8"))
-                info.append("\n--- END README ---\n")
-            except Exception:
-                info.append("(No README)\n")
-            info.append("===== END REPO =====\n\n")
-            return "".join(info)
-        except Exception as e:
-            return f"⚠️ Failed repo {repo.name}: {e}\n"
+def format_repo(node):
+    info = [
+        f"===== REPO: {node['name']} =====\n",
+        f"URL: {node['url']}\n"
+    ]
+    readme = None
+    for i in range(len(README_NAMES)):
+        blob = node[f"readme{i}"]
+        if blob and blob.get("text"):
+            readme = blob["text"]
+            break
+    if readme:
+        info.append("\n--- README ---\n")
+        info.append(readme)
+        info.append("\n--- END README ---\n")
+    else:
+        info.append("(No README)\n")
+    info.append("===== END REPO =====\n\n")
+    return "".join(info)
 
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        futures = [executor.submit(process_repo, repo) for repo in user.get_repos()]
-        for f in as_completed(futures):
-            repo_results.append(f.result())
 
-    return repo_results
+def fetch_repos():
+    headers = {"Authorization": f"bearer {GITHUB_TOKEN}"}
+    cursor = None
+
+    while True:
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            try:
+                payload, remaining, reset_at = post_query(headers, cursor)
+                break
+            except RateLimitError as e:
+                if attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                print(f"⚠️ {e}")
+                wait_for_reset(e.reset_at)
+
+        repos = payload["data"]["viewer"]["repositories"]
+        # Yield page by page so only one page of READMEs is held in memory
+        for node in repos["nodes"]:
+            if node is not None:
+                yield format_repo(node)
+        if not repos["pageInfo"]["hasNextPage"]:
+            break
+        cursor = repos["pageInfo"]["endCursor"]
+        if remaining < RATE_LIMIT_THRESHOLD:
+            wait_for_reset(reset_at)
 
 
 # ================= STEP 2: Save to File =================
 def save_repos(repo_texts, output_file=GITHUB_FILE):
-    with open(output_file, "w", encoding="utf-8") as f:
-        for repo in repo_texts:
-            f.write(repo)
+    # Stream into a temp file and swap it in only once every page was fetched,
+    # so a failed fetch leaves the previous output intact
+    tmp_file = output_file.with_name(output_file.name + ".tmp")
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            for repo in repo_texts:
+                f.write(repo)
+                f.flush()
+        os.replace(tmp_file, output_file)
+    finally:
+        tmp_file.unlink(missing_ok=True)
     print(f"✅ GitHub data saved → {output_file}")
 
 
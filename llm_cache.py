@@ -0,0 +1,82 @@
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+from pathlib import Path
+from contextlib import closing
+
+# ================= CONFIG =================
+CACHE_FILE = Path("data") / "llm_cache.sqlite"
+TTL_SECONDS = 7 * 24 * 3600  # entries older than a week are ignored
+MAX_ENTRIES = 5000           # oldest entries are evicted beyond this
+
+
+# ================= STORAGE =================
+def _connect(cache_file=CACHE_FILE):
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(cache_file)
+    conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, ts INT)")
+    return conn
+
+
+def cache_key(model, messages, temperature, tools=None):
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature, "tools": tools},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get(key):
+    with closing(_connect()) as conn, conn:
+        row = conn.execute("SELECT value, ts FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, ts = row
+        if time.time() - ts > TTL_SECONDS:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return None
+        # Refresh ts on hit so eviction drops the least recently used entries
+        conn.execute("UPDATE cache SET ts = ? WHERE key = ?", (int(time.time()), key))
+    return value.decode("utf-8")
+
+
+def set(key, value):
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, ts) VALUES (?, ?, ?)",
+            (key, value.encode("utf-8"), int(time.time())),
+        )
+        conn.execute(
+            "DELETE FROM cache WHERE key NOT IN (SELECT key FROM cache ORDER BY ts DESC LIMIT ?)",
+            (MAX_ENTRIES,),
+        )
+
+
+# ================= CACHED LLM CALL =================
+async def _complete(llm, messages, stream):
+    if stream:
+        parts = []
+        async for chunk in llm.astream(messages):
+            parts.append(chunk.content)
+        return "".join(parts)
+    resp = await llm.ainvoke(messages)
+    return resp.content
+
+
+async def cached_invoke(llm, messages, stream=False):
+    # Only deterministic calls are safe to replay
+    if llm.temperature != 0:
+        return await _complete(llm, messages, stream)
+
+    key = cache_key(llm.model_name, messages, llm.temperature)
+    # sqlite calls block, so keep them off the event loop shared by concurrent requests
+    cached = await asyncio.to_thread(get, key)
+    if cached is not None:
+        return cached
+
+    content = await _complete(llm, messages, stream)
+    await asyncio.to_thread(set, key, content)
+    return content
@@ -0,0 +1,55 @@
+import os
+import httpx
+from contextlib import asynccontextmanager
+from openai import APITimeoutError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+from langchain_openai import ChatOpenAI
+
+# ================= CONFIG =================
+MODEL = "gpt-4o-mini"
+REQUEST_TIMEOUT = 60.0  # seconds per request, instead of the 600 s client default
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+
+
+# ================= RETRY POLICY =================
+# The client itself never retries (max_retries=0) and gives up after REQUEST_TIMEOUT,
+# so a hung request can't pin a worker; every call site wraps its LLM call in this
+# one policy instead
+llm_retry = retry(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential_jitter(1, 30),
+    retry=retry_if_exception_type((APITimeoutError, RateLimitError)),
+    reraise=True,
+)
+
+
+# ================= SHARED LLM =================
+_LLM = None
+
+
+def _build_llm(**http_kwargs):
+    return ChatOpenAI(
+        model=MODEL,
+        temperature=0,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        timeout=REQUEST_TIMEOUT,
+        max_retries=0,
+        **http_kwargs,
+    )
+
+
+def get_llm():
+    # One ChatOpenAI (and so one connection pool) per process, shared by every
+    # sync call site instead of a fresh pool per instantiation
+    global _LLM
+    if _LLM is None:
+        _LLM = _build_llm(http_client=httpx.Client(limits=HTTP_LIMITS))
+    return _LLM
+
+
+@asynccontextmanager
+async def async_llm():
+    # Async pooled connections belong to the event loop that opened them, so the
+    # client lives for one asyncio.run() and is closed with it rather than cached
+    async with httpx.AsyncClient(limits=HTTP_LIMITS) as http_client:
+        yield _build_llm(http_async_client=http_client)
@@ -1,14 +1,20 @@
 import os
+import hashlib
+import threading
 from dotenv import load_dotenv
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import mammoth
+import pypdfium2 as pdfium
 
 # LangChain imports
-from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
+from langchain_community.document_loaders import TextLoader
 from langchain.embeddings import OpenAIEmbeddings
 from langchain.vectorstores import FAISS
 from langchain.chains import RetrievalQA
-from langchain.chat_models import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from llm_client import get_llm, llm_retry
 
 # ================= CONFIG =================
 load_dotenv()
@@ -18,6 +24,9 @@ OUTPUT_DIR = Path("data")
 COMBINED_FILE = OUTPUT_DIR / "combined.txt"
 FAISS_PATH = OUTPUT_DIR / "faiss_index"
 PROMPT_FILE = OUTPUT_DIR / "prompt.txt"
+EXTRACT_CACHE_DIR = OUTPUT_DIR / ".cache"
+PDFIUM_LOCK = threading.Lock()  # PDFium is not thread-safe, even across separate documents
+EMBEDDING_MODEL = "text-embedding-3-small"  # 1536-dim: half the index size of -large
 
 if not OPENAI_API_KEY:
     raise ValueError("❌ Missing OPENAI_API_KEY in .env")
@@ -36,24 +45,76 @@ def load_prompt(prompt_file=PROMPT_FILE):
     return system_message
 
 # ================= STEP 1: Load Documents =================
+def extract_pdf(path):
+    with PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(path)
+        try:
+            return "\n".join(page.get_textpage().get_text_range() for page in pdf)
+        finally:
+            pdf.close()
+
+def extract_docx(path):
+    with open(path, "rb") as f:
+        return mammoth.extract_raw_text(f).value
+
+# Part of the extraction cache key: bump when an extractor's parser changes
+EXTRACTOR_BACKENDS = {extract_pdf: "pypdfium2", extract_docx: "mammoth"}
+
+def load_cached_text(path, extractor, cache_dir=EXTRACT_CACHE_DIR):
+    # Parsing is deterministic, so key on parser + path + mtime and reuse the extracted
+    # text; including the parser means switching backends invalidates old entries, and
+    # the path-only prefix lets a new entry replace older ones for the same file
+    path = Path(path)
+    parser = f"{extractor.__name__}@{EXTRACTOR_BACKENDS[extractor]}"
+    path_key = hashlib.sha1(str(path).encode()).hexdigest()
+    version_key = hashlib.sha1(f"{parser}:{path}:{path.stat().st_mtime_ns}".encode()).hexdigest()
+    cache_file = cache_dir / f"{path_key}-{version_key}.txt"
+    if cache_file.exists():
+        return cache_file.read_text(encoding="utf-8")
+
+    text = extractor(path)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # Write then rename, so a killed run never leaves a truncated entry behind
+    tmp_file = cache_file.with_suffix(".tmp")
+    try:
+        tmp_file.write_text(text, encoding="utf-8")
+        os.replace(tmp_file, cache_file)
+    finally:
+        tmp_file.unlink(missing_ok=True)
+    for stale in cache_dir.glob(f"{path_key}-*.txt"):
+        if stale != cache_file:
+            stale.unlink(missing_ok=True)
+    return text
+
+def load_file(path):
+    try:
+        if path.endswith(".pdf"):
+            return load_cached_text(path, extract_pdf)
+        elif path.endswith(".txt"):
+            return "\n".join(d.page_content for d in TextLoader(path, encoding="utf-8").load())
+        elif path.endswith(".docx"):
+            return load_cached_text(path, extract_docx)
+    except Exception as e:
+        print(f"⚠️ Skipping {path}: {e}")
+    return None
+
 def load_documents(data_folder="data"):
-    documents = []
-    for root, _, files in os.walk(data_folder):
+    paths = []
+    for root, dirs, files in os.walk(data_folder):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]  # skip the extraction cache
         for file in files:
             path = os.path.join(root, file)
-            try:
-                if file.endswith(".pdf"):
-                    docs = PyPDFLoader(path).load()
-                elif file.endswith(".txt"):
-                    docs = TextLoader(path, encoding="utf-8").load()
-                elif file.endswith(".docx"):
-                    docs = UnstructuredWordDocumentLoader(path).load()
-                else:
-                    continue
-                documents.extend(docs)
-            except Exception as e:
-                print(f"⚠️ Skipping {path}: {e}")
-    return [d.page_content for d in documents]
+            if Path(path) == COMBINED_FILE:  # our own output, would grow on every run
+                continue
+            paths.append(path)
+
+    # Files are independent, so overlap txt/docx loading and cache reads (PDF parsing
+    # itself is serialized by PDFIUM_LOCK); yield each text as soon as it is ready
+    # so combine_and_save streams it to disk
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+        for text in executor.map(load_file, paths):
+            if text is not None:
+                yield text
 
 # ================= STEP 2: Combine and Save =================
 def combine_and_save(docs, output_file=COMBINED_FILE):
@@ -64,23 +125,42 @@ def combine_and_save(docs, output_file=COMBINED_FILE):
 
 # ================= STEP 3: Build FAISS =================
 def build_vectorstore(combined_file=COMBINED_FILE, faiss_path=FAISS_PATH):
-    embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY, model="text-embedding-3-large")
+    embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY, model=EMBEDDING_MODEL)
+    with open(combined_file, "rb") as f:
+        raw = f.read()
+    # Include the model so switching embeddings invalidates the saved index
+    digest = hashlib.sha256(EMBEDDING_MODEL.encode() + b"\0" + raw).hexdigest()
+    marker = faiss_path / f"{digest}.marker"
+    if marker.exists():
+        print("📂 Combined data unchanged, loading existing FAISS index...")
+        return FAISS.load_local(str(faiss_path), embeddings, allow_dangerous_deserialization=True)
+
     print("🆕 Creating FAISS index from combined data...")
-    with open(combined_file, "r", encoding="utf-8") as f:
-        text = f.read()
-    vectorstore = FAISS.from_texts([text], embeddings)
+    text = raw.decode("utf-8")
+    # Count in the embedding model's cl100k tokens; READMEs may contain literal "<|endoftext|>"
+    splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name="cl100k_base", chunk_size=500, chunk_overlap=50, disallowed_special=()
+    )
+    chunks = splitter.split_text(text)
+    if not chunks:
+        raise ValueError(f"❌ No text to index in {combined_file}")
+    print(f"✅ Split combined data into {len(chunks)} chunks")
+    vectorstore = FAISS.from_texts(chunks, embeddings, metadatas=[{"source": str(combined_file)}] * len(chunks))
     vectorstore.save_local(str(faiss_path))
+    for stale in faiss_path.glob("*.marker"):
+        stale.unlink()
+    marker.touch()
     return vectorstore
 
 # ================= STEP 4: Build QA Chain =================
 def build_qa_chain(vectorstore, system_prompt):
     retriever = vectorstore.as_retriever(search_kwargs={"k": 10})
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_llm()
 
-    human_message = HumanMessagePromptTemplate.from_template(
-        "Here is the context:\n{context}\n\nNow answer the question:\n{question}"
-    )
-    prompt = ChatPromptTemplate.from_messages([system_prompt, human_message])
+    # Instructions and retrieved context lead as system turns; only the question varies at the end
+    context_message = SystemMessagePromptTemplate.from_template("CONTEXT:\n{context}")
+    human_message = HumanMessagePromptTemplate.from_template("{question}")
+    prompt = ChatPromptTemplate.from_messages([system_prompt, context_message, human_message])
 
     qa_chain = RetrievalQA.from_chain_type(
         llm=llm,
@@ -91,6 +171,10 @@ def build_qa_chain(vectorstore, system_prompt):
     )
     return qa_chain
 
+@llm_retry
+def ask(qa_chain, query):
+    return qa_chain.invoke({"query": query})
+
 # ================= MAIN PIPELINE =================
 def run_pipeline():
     print("🔄 Loading recruiter prompt...")
@@ -116,7 +200,7 @@ def run_pipeline():
             break
         print("💭 Thinking...")
         try:
-            result = qa_chain.invoke({"query": query})
+            result = ask(qa_chain, query)
             print("\nAnswer:", result["result"])
             print("\nSources:")
             for doc in result["source_documents"]:
@@ -1,10 +1,14 @@
 import os
+import asyncio
+import hashlib
+import numpy as np
+import tiktoken
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from langchain.chat_models import ChatOpenAI
+from langchain.embeddings import OpenAIEmbeddings
 from langchain.schema import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from llm_cache import cached_invoke
+from llm_client import MODEL, async_llm, llm_retry
 
 # ================= CONFIG =================
 load_dotenv()  # Load environment variables from .env
@@ -15,7 +19,11 @@ if not OPENAI_API_KEY:
 DATA_DIR = Path("data")
 INPUT_FILE = DATA_DIR / "github_data.txt"
 OUTPUT_FILE = DATA_DIR / "summarize.txt"
-MAX_WORKERS = 5
+CHUNK_EMB_FILE = DATA_DIR / "chunk_emb.npy"
+CHUNK_EMB_DIGEST_FILE = DATA_DIR / "chunk_emb.sha256"  # which chunks chunk_emb.npy was built from
+EMBEDDING_MODEL = "text-embedding-3-small"
+DEDUP_THRESHOLD = 0.9  # cosine similarity above which a chunk counts as a duplicate
+MAX_CONCURRENCY = 20  # requests in flight at once
 
 # ================= LOAD DATA =================
 def load_data(file_path=INPUT_FILE):
@@ -27,47 +35,103 @@ def load_data(file_path=INPUT_FILE):
     return text
 
 # ================= SPLIT INTO CHUNKS =================
-def split_text(text, chunk_size=1200, chunk_overlap=0):
-    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    docs = splitter.split_documents([Document(page_content=text)])
+def split_text(text, chunk_size=2000, chunk_overlap=200):
+    # Window over BPE tokens, which is what the model bills and context-limits by
+    enc = tiktoken.encoding_for_model(MODEL)
+    toks = enc.encode(text, disallowed_special=())  # READMEs may contain literal "<|endoftext|>"
+    stride = chunk_size - chunk_overlap
+    # Stop before a final window that would lie entirely inside the previous overlap
+    starts = range(0, max(len(toks) - chunk_overlap, 1), stride) if toks else []
+    docs = [Document(page_content=enc.decode(toks[start:start + chunk_size])) for start in starts]
     print(f"✅ Split text into {len(docs)} chunks")
     return docs
 
+# ================= DROP NEAR-DUPLICATE CHUNKS =================
+def embed_chunks(docs, emb_file=CHUNK_EMB_FILE, digest_file=CHUNK_EMB_DIGEST_FILE):
+    texts = [d.page_content for d in docs]
+    digest = hashlib.sha256("\0".join([EMBEDDING_MODEL, *texts]).encode("utf-8")).hexdigest()
+    if emb_file.exists() and digest_file.exists() and digest_file.read_text().strip() == digest:
+        print("📂 Chunks unchanged, reusing saved embeddings")
+        return np.load(emb_file)
+
+    embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY, model=EMBEDDING_MODEL)
+    # Contiguous (N, D) float32 matrix, normalized once so dot products are cosines
+    emb = np.ascontiguousarray(embeddings.embed_documents(texts), dtype=np.float32)
+    emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+    np.save(emb_file, emb)
+    digest_file.write_text(digest)
+    return emb
+
+def dedupe_chunks(docs, threshold=DEDUP_THRESHOLD):
+    if not docs:
+        return docs
+    emb = embed_chunks(docs)
+
+    # All pairwise similarities in one BLAS call, then a greedy scan over earlier kept chunks
+    sims = emb @ emb.T
+    kept = np.zeros(len(emb), dtype=bool)
+    for i in range(len(emb)):
+        kept[i] = not np.any(sims[i, :i][kept[:i]] > threshold)
+
+    print(f"✅ Kept {int(kept.sum())} of {len(docs)} chunks after deduplication")
+    return [doc for doc, keep in zip(docs, kept) if keep]
+
 # ================= SUMMARIZE CHUNKS IN PARALLEL =================
-def summarize_chunk(llm, doc: Document, idx: int):
+@llm_retry
+async def summarize_chunk(llm, doc: Document, idx: int):
     print(f"💭 Summarizing chunk {idx + 1}...")
-    resp = llm.invoke([
+    content = await cached_invoke(llm, [
         {"role": "system", "content": "Extract structured notes. Keep all important details."},
         {"role": "user", "content": doc.page_content}
-    ])
+    ], stream=True)  # tokens arrive while other chunks' requests are in flight
     print(f"✅ Finished chunk {idx + 1}")
-    return resp.content
+    return content
 
-def summarize_chunks_parallel(docs):
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, api_key=OPENAI_API_KEY)
-    results = []
+async def summarize_chunks_parallel(llm, docs, sem):
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(summarize_chunk, llm, doc, idx): idx for idx, doc in enumerate(docs)}
-        for future in as_completed(futures):
+    async def bounded(doc, idx):
+        async with sem:
             try:
-                results.append(future.result())
+                return await summarize_chunk(llm, doc, idx)
             except Exception as e:
-                idx = futures[future]
                 print(f"⚠️ Error summarizing chunk {idx + 1}: {e}")
+                return None
 
-    return results
+    results = await asyncio.gather(*[bounded(doc, idx) for idx, doc in enumerate(docs)])
+    return [r for r in results if r is not None]
 
 # ================= HIERARCHICAL FINAL SUMMARY =================
-def merge_partial_summaries(partials):
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, api_key=OPENAI_API_KEY)
+@llm_retry
+async def merge_summaries(llm, summaries, sem):
+    async with sem:
+        return await cached_invoke(llm, [
+            {"role": "system", "content": "Merge the following summaries into one concise, structured summary without repetition. Use sections: Profile, Skills, Projects, Education, Soft Skills."},
+            {"role": "user", "content": "\n\n".join(summaries)}
+        ])
+
+async def reduce_summaries(llm, partials, sem):
+    # Pairwise tree of merges: each call sees at most two inputs, siblings run concurrently.
+    # A lone branch is passed up as-is rather than "merged" on its own.
+    if len(partials) == 1:
+        return partials[0]
+    if len(partials) <= 2:
+        return await merge_summaries(llm, partials, sem)
+    mid = len(partials) // 2
+    left, right = await asyncio.gather(
+        reduce_summaries(llm, partials[:mid], sem),
+        reduce_summaries(llm, partials[mid:], sem),
+    )
+    return await merge_summaries(llm, [left, right], sem)
+
+async def merge_partial_summaries(llm, partials, sem):
     print("🔄 Merging partial summaries into final summary...")
-    final = llm.invoke([
-        {"role": "system", "content": "Merge the following summaries into one concise, structured summary without repetition. Use sections: Profile, Skills, Projects, Education, Soft Skills."},
-        {"role": "user", "content": "\n\n".join(partials)}
-    ])
+    if len(partials) == 1:
+        # Still one pass so the final summary gets the sectioned format
+        final = await merge_summaries(llm, partials, sem)
+    else:
+        final = await reduce_summaries(llm, partials, sem)
     print("✅ Final summary created")
-    return final.content
+    return final
 
 # ================= SAVE SUMMARY =================
 def save_summary(summary, output_file=OUTPUT_FILE):
@@ -76,12 +140,20 @@ def save_summary(summary, output_file=OUTPUT_FILE):
     print(f"✅ Summary saved → {output_file}")
 
 # ================= PIPELINE =================
-def run_pipeline():
+async def main():
     text = load_data()
-    chunks = split_text(text, chunk_size=1200, chunk_overlap=0)  # minimal overlap
-    partial_summaries = summarize_chunks_parallel(chunks)
-    final_summary = merge_partial_summaries(partial_summaries)
+    chunks = split_text(text, chunk_size=2000, chunk_overlap=200)  # sizes in tokens
+    chunks = dedupe_chunks(chunks)
+    # One limit for map and merge calls alike, and one client (and connection pool)
+    # scoped to this event loop
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    async with async_llm() as llm:
+        partial_summaries = await summarize_chunks_parallel(llm, chunks, sem)
+        final_summary = await merge_partial_summaries(llm, partial_summaries, sem)
     save_summary(final_summary)
 
+def run_pipeline():
+    asyncio.run(main())
+
 if __name__ == "__main__":
     run_pipeline()
@@ -1,7 +1,7 @@
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-from langchain_openai import ChatOpenAI  # updated import
+from llm_client import get_llm, llm_retry
 from langchain.schema import HumanMessage, SystemMessage
 
 # ================= CONFIG =================
@@ -33,14 +33,13 @@ def load_text(file_path=COMBINED_FILE):
 
 # ================= BUILD QA CHAIN =================
 def build_qa_chain(context_text, system_prompt_text):
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, api_key=OPENAI_API_KEY)
+    llm = get_llm()
+    # Built once: a constant leading prefix lets OpenAI prompt caching reuse the context tokens
+    system_message = SystemMessage(content=f"{system_prompt_text}\n\nCONTEXT:\n{context_text}")
 
+    @llm_retry
     def qa_chain(query):
-        messages = [
-            SystemMessage(content=system_prompt_text),
-            HumanMessage(content=f"Here is the context:\n{context_text}\n\nNow answer the question:\n{query}")
-        ]
-        response = llm(messages)
+        response = llm([system_message, HumanMessage(content=query)])
         return response
 
     return qa_chain